@@ -7,6 +7,7 @@
 # SPDX-License-Identifier: MIT
 
 import functools
+import hashlib
 import multiprocessing
 import os
 import os.path
@@ -18,12 +19,15 @@ import stat
 import subprocess
 import sys
 import tempfile
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import platformdirs
 import requests
 import semver
 
+from circuitpython_build_tools import cache
+from circuitpython_build_tools.log import logger
+
 
 @functools.cache
 def _git_version():
@@ -62,11 +66,14 @@ else:
 mpy_cross_path = platformdirs.user_cache_path("circuitpython-build-tools", ensure_exists=True)
 
 
+# Cached so that every bundle pass and the bundle JSON share a single parse per
+# library. The returned dict is shared between callers and must not be modified.
+@functools.cache
 def load_pyproject_toml(lib_path: pathlib.Path):
     try:
         return load_toml((lib_path / "pyproject.toml").read_text(encoding="utf-8"))
     except FileNotFoundError:
-        print(f"No pyproject.toml in {lib_path}")
+        logger.debug(f"No pyproject.toml in {lib_path}")
         return {}
 
 
@@ -86,6 +93,8 @@ GLOB_PATTERNS = ["*.py", "*.bin"]
 S3_MPY_PREFIX = "https://adafruit-circuit-python.s3.amazonaws.com/bin/mpy-cross"
 
 
+# Cached because every bundle pass asks for the version of every library
+@functools.cache
 def version_string(path=None, *, valid_semver=False):
     version = None
     tag = subprocess.run(
@@ -133,13 +142,18 @@ def version_string(path=None, *, valid_semver=False):
     return version
 
 
+def mpy_cross_filename_for(version):
+    ext = ".exe" * (os.name == "nt")
+    return mpy_cross_path / f"mpy-cross-{version['name']}{ext}"
+
+
 def mpy_cross(version, quiet=False):
     circuitpython_tag = version["tag"]
-    name = version["name"]
     ext = ".exe" * (os.name == "nt")
-    mpy_cross_filename = mpy_cross_path / f"mpy-cross-{name}{ext}"
+    mpy_cross_filename = mpy_cross_filename_for(version)
 
     if os.path.isfile(mpy_cross_filename):
+        cache.record_use(mpy_cross_path, mpy_cross_filename.name)
         return mpy_cross_filename
 
     # Try to pull from S3
@@ -157,14 +171,14 @@ def mpy_cross(version, quiet=False):
     elif uname[0].title() == "Windows" and uname[4].lower() in {"amd64", "x86_64"}:
         s3_url = f"{S3_MPY_PREFIX}/windows/mpy-cross-windows-{circuitpython_tag}.static.exe"
     elif not quiet:
-        print(
-            "Pre-built mpy-cross not available for",
-            f"sysname='{uname[0]}' release='{uname[2]}' machine='{uname[4]}'.",
+        logger.info(
+            "Pre-built mpy-cross not available for "
+            f"sysname='{uname[0]}' release='{uname[2]}' machine='{uname[4]}'."
         )
 
     if s3_url is not None:
         if not quiet:
-            print(f"Checking S3 for {s3_url}")
+            logger.info(f"Checking S3 for {s3_url}")
         try:
             r = requests.get(s3_url)
             if r.status_code == 200:
@@ -173,21 +187,23 @@ def mpy_cross(version, quiet=False):
                     # Set the User Execute bit
                     os.chmod(mpy_cross_filename, os.stat(mpy_cross_filename)[0] | stat.S_IXUSR)
                     if not quiet:
-                        print("  FOUND")
+                        logger.info("  FOUND")
+                    cache.record_use(mpy_cross_path, mpy_cross_filename.name)
                     return mpy_cross_filename
         except Exception as e:
             if not quiet:
-                print(f"    exception fetching from S3: {e}")
+                logger.warning(f"    exception fetching from S3: {e}")
         if not quiet:
-            print("  NOT FOUND")
+            logger.info("  NOT FOUND")
 
     if not quiet:
         title = "Building mpy-cross for circuitpython " + circuitpython_tag
-        print()
-        print(title)
-        print("=" * len(title))
+        logger.info("")
+        logger.info(title)
+        logger.info("=" * len(title))
 
     build_dir = mpy_cross_path / f"build-circuitpython-{circuitpython_tag}"
+    cache.record_use(mpy_cross_path, build_dir.name)
     if not os.path.isdir(build_dir):
         subprocess.check_call(
             [
@@ -211,6 +227,7 @@ def mpy_cross(version, quiet=False):
         mpy_built = build_dir / f"mpy-cross/mpy-cross{ext}"
 
     shutil.copy(mpy_built, mpy_cross_filename)
+    cache.record_use(mpy_cross_path, mpy_cross_filename.name)
     return mpy_cross_filename
 
 
@@ -243,9 +260,9 @@ def get_package_info(library_path, package_folder_prefix):
     blocklisted = [name for name in py_modules if name in pyproject_py_modules_blocklist]
 
     if blocklisted:
-        print(
-            f"{lib_path}/settings.toml:1: {blocklisted[0]}",
-            "blocklisted: not using metadata from pyproject.toml",
+        logger.warning(
+            f"{lib_path}/settings.toml:1: {blocklisted[0]} "
+            "blocklisted: not using metadata from pyproject.toml"
         )
         py_modules = packages = ()
 
@@ -258,7 +275,7 @@ def get_package_info(library_path, package_folder_prefix):
 
     if packages:
         if len(packages) > 1:
-            print("Using first package defined in pyproject.toml as top-level package name")
+            logger.debug("Using first package defined in pyproject.toml as top-level package name")
         package_name = packages[0]
         # print(f"Using package name from pyproject.toml: {package_name}")
         package_info["is_package"] = True
@@ -278,7 +295,7 @@ def get_package_info(library_path, package_folder_prefix):
         py_files = [lib_path / f"{py_module}.py"]
 
     else:
-        print(f"{lib_path}: Using legacy autodetection")
+        logger.debug(f"{lib_path}: Using legacy autodetection")
         _detect_legacy_package_structure(
             package_info,
             package_files,
@@ -303,8 +320,8 @@ def get_package_info(library_path, package_folder_prefix):
     try:
         package_info["version"] = version_string(library_path, valid_semver=True)
     except ValueError as e:
-        print(library_path + " has version that doesn't follow SemVer (semver.org)")
-        print(e)
+        logger.warning(library_path + " has version that doesn't follow SemVer (semver.org)")
+        logger.warning(e)
         package_info["version"] = version_string(library_path)
 
     return package_info
@@ -344,7 +361,14 @@ def _detect_legacy_package_structure(
         package_info["module_name"] = None
 
 
-def library(
+class LibraryAction(NamedTuple):
+    # "compile" to .mpy, "munge" the version into a .py, or "copy" unchanged
+    kind: str
+    source: pathlib.Path
+    destination: str
+
+
+def library_actions(
     library_path, output_directory, package_folder_prefix, mpy_cross=None, example_bundle=False
 ):
     lib_path = pathlib.Path(library_path)
@@ -353,20 +377,21 @@ def library(
     example_files = package_info["example_files"]
     module_name = package_info["module_name"]
 
-    for fn in py_package_files:
-        base_dir = os.path.join(output_directory, fn.relative_to(library_path).parent)
-        if not os.path.isdir(base_dir):
-            os.makedirs(base_dir)
-
-    library_version = package_info["version"]
-
+    actions = []
     if not example_bundle:
         for filename in py_package_files:
-            full_path = os.path.join(library_path, filename)
-            output_file = output_directory / filename.relative_to(library_path)
-            _run_mpy_cross_on_mod(
-                filename, full_path, output_file, mpy_cross, library_path, library_version
-            )
+            relative_filename = filename.relative_to(library_path)
+            if filename.suffix != ".py":
+                kind = "copy"
+            elif mpy_cross:
+                # Modules that are empty once munged are still staged as .py
+                kind = "compile"
+                relative_filename = relative_filename.with_suffix(".mpy")
+            else:
+                kind = "munge"
+            output_file = os.path.join(output_directory, relative_filename)
+            actions.append(LibraryAction(kind, filename, output_file))
+
     requirements_files = lib_path.glob("requirements.txt*")
     requirements_files = [f for f in requirements_files if f.stat().st_size > 0]
 
@@ -376,26 +401,97 @@ def library(
 
     if module_name and requirements_files and not example_bundle:
         requirements_dir = pathlib.Path(output_directory).parent / "requirements"
-        if not os.path.isdir(requirements_dir):
-            os.makedirs(requirements_dir, exist_ok=True)
         requirements_subdir = f"{requirements_dir}/{module_name}"
-        if not os.path.isdir(requirements_subdir):
-            os.makedirs(requirements_subdir, exist_ok=True)
         for filename in requirements_files:
-            full_path = os.path.join(library_path, filename)
             output_file = os.path.join(requirements_subdir, filename.name)
-            shutil.copyfile(full_path, output_file)
+            actions.append(LibraryAction("copy", filename, output_file))
 
     for filename in example_files:
-        full_path = os.path.join(library_path, filename)
-
         relative_filename_parts = list(filename.relative_to(library_path).parts)
         relative_filename_parts.insert(1, library_path.split(os.path.sep)[-1])
         final_relative_filename = os.path.join(*relative_filename_parts)
         output_file = os.path.join(output_directory.replace("/lib", "/"), final_relative_filename)
+        actions.append(LibraryAction("copy", filename, output_file))
+
+    return package_info, actions
+
+
+def library(
+    library_path,
+    output_directory,
+    package_folder_prefix,
+    mpy_cross=None,
+    example_bundle=False,
+    compile_cache=None,
+):
+    package_info, actions = library_actions(
+        library_path, output_directory, package_folder_prefix, mpy_cross, example_bundle
+    )
+    library_version = package_info["version"]
 
-        os.makedirs(os.path.join(*output_file.split(os.path.sep)[:-1]), exist_ok=True)
-        shutil.copyfile(full_path, output_file)
+    if mpy_cross and pathlib.Path(mpy_cross).parent == mpy_cross_path:
+        # Refreshed for every library rather than once per run, so that a run
+        # longer than cache.EVICTION_GRACE never has its mpy-cross evicted
+        cache.record_use(mpy_cross_path, pathlib.Path(mpy_cross).name)
+
+    for action in actions:
+        os.makedirs(os.path.dirname(action.destination), exist_ok=True)
+        if action.kind == "copy":
+            _stage_file(action.source, action.destination)
+        else:
+            _run_mpy_cross_on_mod(
+                action.source,
+                str(action.source),
+                pathlib.Path(action.destination).with_suffix(".py"),
+                mpy_cross,
+                library_path,
+                library_version,
+                compile_cache,
+            )
+
+    return package_info["module_name"]
+
+
+def _stage_file(source, destination):
+    # Files that are staged unmodified are hardlinked rather than copied, so
+    # that every bundle pass shares the bytes of the source checkout. The
+    # staging tree is only ever read and then deleted, never written through.
+    # A file already staged is removed first, since copying onto a link to the
+    # source raises SameFileError.
+    if os.path.lexists(destination):
+        os.remove(destination)
+    if "NO_USE_HARDLINKS" not in os.environ:
+        try:
+            os.link(source, destination)
+            return
+        except OSError:
+            pass  # Different filesystem or no hardlink support
+    shutil.copyfile(source, destination)
+
+
+def _compile_cache_file(compile_cache, mpy_cross, source_name, munged_path):
+    # The compiled output only depends on the compiler, the source name that
+    # is embedded in the .mpy, and the munged source itself
+    digest = hashlib.sha256(f"{mpy_cross}\0{source_name}\0".encode())
+    with open(munged_path, "rb") as munged_file:
+        digest.update(munged_file.read())
+    return os.path.join(compile_cache, digest.hexdigest() + ".mpy")
+
+
+def _compile_mod(mpy_cross, output_file, source_name, munged_path, full_path, compile_cache):
+    cached_file = None
+    if compile_cache is not None:
+        cached_file = _compile_cache_file(compile_cache, mpy_cross, source_name, munged_path)
+        if os.path.exists(cached_file):
+            _stage_file(cached_file, output_file)
+            return
+    mpy_success = subprocess.call([mpy_cross, "-o", output_file, "-s", source_name, munged_path])
+    if mpy_success != 0:
+        raise RuntimeError("mpy-cross failed on", full_path)
+    if cached_file is not None:
+        # Replace atomically so a concurrent reader never sees a partial file
+        _stage_file(output_file, f"{cached_file}.{os.getpid()}")
+        os.replace(f"{cached_file}.{os.getpid()}", cached_file)
 
 
 def _run_mpy_cross_on_mod(
@@ -405,6 +501,7 @@ def _run_mpy_cross_on_mod(
     mpy_cross: pathlib.Path | None,
     library_path: str,
     library_version: str,
+    compile_cache: str | None = None,
 ) -> None:
     if filename.suffix == ".py":
         with tempfile.NamedTemporaryFile(delete=False, mode="w+") as temp_file:
@@ -413,22 +510,17 @@ def _run_mpy_cross_on_mod(
                 _munge_to_temp(full_path, temp_file, library_version)
                 temp_file.close()
                 if mpy_cross and os.stat(temp_file.name).st_size != 0:
-                    output_file = output_file.with_suffix(".mpy")
-                    mpy_success = subprocess.call(
-                        [
-                            mpy_cross,
-                            "-o",
-                            output_file,
-                            "-s",
-                            str(filename.relative_to(library_path)),
-                            temp_file.name,
-                        ]
+                    _compile_mod(
+                        mpy_cross,
+                        output_file.with_suffix(".mpy"),
+                        str(filename.relative_to(library_path)),
+                        temp_file_name,
+                        full_path,
+                        compile_cache,
                     )
-                    if mpy_success != 0:
-                        raise RuntimeError("mpy-cross failed on", full_path)
                 else:
                     shutil.copyfile(temp_file_name, output_file)
             finally:
                 os.remove(temp_file_name)
     else:
-        shutil.copyfile(full_path, output_file)
+        _stage_file(full_path, output_file)
@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import os.path
+import re
+import shutil
+import tempfile
+import time
+from typing import NamedTuple
+
+# Usage times are kept as the mtime of one empty file per entry. Touching a
+# file is atomic, so concurrent builds sharing a cache never corrupt the
+# records the way a shared index file could.
+USAGE_DIR = ".usage"
+
+# Seconds each library took to build in earlier runs, per kind of bundle pass
+TIMINGS_FILE = ".timings.json"
+
+# Entries used this recently may belong to a build that is still running, so
+# they are never evicted.
+EVICTION_GRACE = 60 * 60
+
+# Entries are renamed to this prefix before they are deleted
+TRASH_PREFIX = ".trash-"
+
+ENTRY_PATTERNS = (
+    re.compile(r"mpy-cross-(?P<name>.+?)(\.exe)?"),
+    re.compile(r"build-circuitpython-(?P<tag>.+)"),
+)
+
+
+class CacheEntry(NamedTuple):
+    name: str
+    path: str
+    size: int
+    last_used: float
+
+
+def record_use(cache_dir, name):
+    usage_dir = os.path.join(cache_dir, USAGE_DIR)
+    os.makedirs(usage_dir, exist_ok=True)
+    usage_file = os.path.join(usage_dir, name)
+    with open(usage_file, "a"):
+        pass
+    os.utime(usage_file)
+
+
+def _size(path):
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            total += os.lstat(os.path.join(root, name)).st_size
+    return total
+
+
+def _last_used(cache_dir, name):
+    for path in (os.path.join(cache_dir, USAGE_DIR, name), os.path.join(cache_dir, name)):
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            pass
+    return 0.0
+
+
+def entries(cache_dir):
+    """Return the cached mpy-cross binaries and CircuitPython clones, least recently used first"""
+    result = []
+    for name in os.listdir(cache_dir):
+        if not any(pattern.fullmatch(name) for pattern in ENTRY_PATTERNS):
+            continue
+        path = os.path.join(cache_dir, name)
+        result.append(CacheEntry(name, path, _size(path), _last_used(cache_dir, name)))
+    return sorted(result, key=lambda entry: entry.last_used)
+
+
+def _delete(path):
+    # Several cleanups may delete the same trash at once
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove(cache_dir, entry):
+    # Rename first so that a concurrent build never sees a half deleted entry
+    trash = os.path.join(cache_dir, f"{TRASH_PREFIX}{entry.name}-{os.getpid()}")
+    try:
+        os.rename(entry.path, trash)
+    except FileNotFoundError:
+        return
+    _delete(trash)
+    try:
+        os.remove(os.path.join(cache_dir, USAGE_DIR, entry.name))
+    except FileNotFoundError:
+        pass
+
+
+def evict(cache_dir, max_size):
+    """Remove least recently used entries until the cache fits in max_size bytes"""
+    cached = entries(cache_dir)
+    total = sum(entry.size for entry in cached)
+    removed = []
+    now = time.time()
+    for entry in cached:
+        if total <= max_size:
+            break
+        if now - entry.last_used < EVICTION_GRACE:
+            continue
+        remove(cache_dir, entry)
+        removed.append(entry)
+        total -= entry.size
+    return removed
+
+
+def is_stale(entry, versions):
+    for pattern in ENTRY_PATTERNS:
+        match = pattern.fullmatch(entry.name)
+        if match is None:
+            continue
+        if "name" in match.groupdict():
+            return match["name"] not in {version["name"] for version in versions}
+        return match["tag"] not in {version["tag"] for version in versions}
+    return False
+
+
+def prune(cache_dir, versions):
+    """
+    Remove entries for CircuitPython versions that are no longer targeted,
+    and whatever an interrupted removal left behind
+    """
+    removed = []
+    for name in os.listdir(cache_dir):
+        if not name.startswith(TRASH_PREFIX):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            removed.append(CacheEntry(name, path, _size(path), 0.0))
+        except FileNotFoundError:
+            continue  # Deleted by the cleanup that left it
+        _delete(path)
+    now = time.time()
+    for entry in entries(cache_dir):
+        # A build with older build tools may still be using a stale entry
+        if is_stale(entry, versions) and now - entry.last_used >= EVICTION_GRACE:
+            remove(cache_dir, entry)
+            removed.append(entry)
+    return removed
+
+
+def load_timings(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, TIMINGS_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_timings(cache_dir, kind, timings):
+    """Merge the timings of one bundle pass into the recorded ones"""
+    recorded = load_timings(cache_dir)
+    recorded.setdefault(kind, {}).update(timings)
+    # Replace atomically so that concurrent builds never read a partial file
+    with tempfile.NamedTemporaryFile("w", dir=cache_dir, prefix=".timings-", delete=False) as f:
+        json.dump(recorded, f, sort_keys=True)
+    os.replace(f.name, os.path.join(cache_dir, TIMINGS_FILE))
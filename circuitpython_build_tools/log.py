@@ -0,0 +1,118 @@
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+import atexit
+import json
+import logging
+import sys
+
+logger = logging.getLogger("circuitpython_build_tools")
+
+# Set up by setup(): the open JSON-lines event stream, and whether a progress
+# line should be drawn. progress_line is set while one is left unfinished.
+# Worker processes set up by setup_worker() keep their records in collector.
+_state = {"events": None, "progress": False, "progress_line": False, "collector": None}
+
+
+class _ConsoleHandler(logging.StreamHandler):
+    """Finish an updating progress line before writing a record after it"""
+
+    def emit(self, record):
+        if _state["progress_line"]:
+            self.stream.write("\n")
+            _state["progress_line"] = False
+        super().emit(record)
+
+
+class _RecordCollector(logging.Handler):
+    """Keep the records of a worker process for its parent to log"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Format the message now, since its arguments may not pickle
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+
+def setup(quiet=False, verbose=False, log_file=None, events_file=None):
+    """
+    Send build output to the console and optionally a log file
+
+    The console gets warnings and errors when quiet, per-file detail when
+    verbose, and a summary of each step otherwise. The log file always gets
+    everything. Events are written to events_file as JSON lines.
+    """
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    console = _ConsoleHandler(sys.stdout)
+    if quiet:
+        console.setLevel(logging.WARNING)
+    elif verbose:
+        console.setLevel(logging.DEBUG)
+    else:
+        console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(console)
+
+    if log_file:
+        file_handler = logging.FileHandler(log_file, mode="w", encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        logger.addHandler(file_handler)
+
+    if _state["events"] is not None:
+        _state["events"].close()
+    _state["events"] = open(events_file, "w", encoding="utf-8") if events_file else None
+    if _state["events"] is not None:
+        atexit.register(_state["events"].close)
+    _state["progress"] = not quiet and not verbose and sys.stdout.isatty()
+
+
+def setup_worker():
+    """
+    Collect the output of a worker process instead of writing it. Depending
+    on the start method, workers either share no handlers with the parent or
+    share its open files, so the parent logs the records through its own.
+    """
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    _state.update(events=None, progress=False, progress_line=False)
+    _state["collector"] = _RecordCollector()
+    logger.addHandler(_state["collector"])
+
+
+def collected_records():
+    """Return the records a worker collected since the last call"""
+    collector = _state["collector"]
+    if collector is None:
+        return []
+    records, collector.records = collector.records, []
+    return records
+
+
+def event(kind, **fields):
+    if _state["events"] is not None:
+        _state["events"].write(json.dumps({"event": kind, **fields}) + "\n")
+
+
+def progress(label, done, total):
+    """Show a single updating progress line when the console is a terminal"""
+    if not _state["progress"]:
+        return
+    # Drawn on the console stream so that log records can end it first
+    _state["progress_line"] = done != total
+    end = "" if _state["progress_line"] else "\n"
+    print(f"\r{label}: {done}/{total}", end=end, flush=True)
@@ -4,19 +4,27 @@
 #
 # SPDX-License-Identifier: MIT
 
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import importlib.metadata as importlib_metadata
 import json
 import os
 import os.path
+import pathlib
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
 import zipfile
 
 import click
 
-from circuitpython_build_tools import build, target_versions
+from circuitpython_build_tools import build, cache, log, target_versions, verify
+from circuitpython_build_tools.log import logger
 
 BLINKA_LIBRARIES = [
     "adafruit-blinka",
@@ -38,13 +46,17 @@ def normalize_dist_name(name: str) -> str:
     return name.lower().replace("_", "-")
 
 
-def add_file(bundle, src_file, zip_name):
+def add_file(bundle, src_file, zip_name, hashes=None):
     bundle.write(src_file, zip_name)
+    if hashes is not None:
+        with open(src_file, "rb") as f:
+            hashes[zip_name.replace(os.sep, "/")] = hashlib.sha256(f.read()).hexdigest()
     file_size = os.stat(src_file).st_size
     file_sector_size = file_size
     if file_size % 512 != 0:
         file_sector_size = (file_size // 512 + 1) * 512
-    print(zip_name, file_size, file_sector_size)
+    logger.debug(f"{zip_name} {file_size} {file_sector_size}")
+    log.event("file", bundle=bundle.filename, name=zip_name, size=file_size)
     return file_sector_size
 
 
@@ -67,9 +79,22 @@ def get_module_name(library_path, remote_name):
     return module_name, repo
 
 
+def _requirement_lines(directory):
+    """
+    Yield the raw requirement strings of a library, from requirements.txt
+    and the `project.dependencies` table of pyproject.toml
+    """
+    path = directory + "/requirements.txt"
+    if os.path.exists(path):
+        with open(path) as file:
+            yield from file.read().split("\n")
+    pyproject_toml = build.load_pyproject_toml(pathlib.Path(directory))
+    yield from build.get_nested(pyproject_toml, "project", "dependencies", default=[])
+
+
 def get_bundle_requirements(directory, package_list):
     """
-    Open the requirements.txt if it exists
+    Open the requirements.txt and pyproject.toml if they exist
     Remove anything that shouldn't be a requirement like Adafruit_Blinka
     Return the list
     """
@@ -77,29 +102,101 @@ def get_bundle_requirements(directory, package_list):
     pypi_reqs = set()  # For multiple bundle dependency
     dependencies = set()  # For intra-bundle dependency
 
-    path = directory + "/requirements.txt"
-    if os.path.exists(path):
-        with open(path) as file:
-            requirements = file.read()
-            file.close()
-            for line in requirements.split("\n"):
-                pkg = line.lower().strip()
-                if pkg.startswith("#") or not pkg:
-                    # skip comments
-                    pass
-                else:
-                    # Remove any pip version and platform specifiers
-                    original_name = re.split("[<>=~[;]", pkg)[0].strip()
-                    # Normalize to match the indexes in package_list
-                    pkg = normalize_dist_name(original_name)
-                    if pkg in package_list:
-                        dependencies.add(package_list[pkg]["module_name"])
-                    elif pkg not in BLINKA_LIBRARIES:
-                        # add with the exact spelling from requirements.txt
-                        pypi_reqs.add(original_name)
+    for line in _requirement_lines(directory):
+        pkg = line.lower().strip()
+        if pkg.startswith("#") or not pkg:
+            # skip comments
+            pass
+        else:
+            # Remove any pip version and platform specifiers
+            original_name = re.split("[<>=~![;@ ]", pkg)[0].strip()
+            # Normalize to match the indexes in package_list
+            pkg = normalize_dist_name(original_name)
+            if pkg in package_list:
+                dependencies.add(package_list[pkg]["module_name"])
+            elif pkg not in BLINKA_LIBRARIES:
+                # add with the exact spelling from requirements.txt
+                pypi_reqs.add(original_name)
     return sorted(dependencies), sorted(pypi_reqs)
 
 
+def resolve_bundle_dependencies(dependencies):
+    """
+    Compute the transitive closure of the intra-bundle dependency graph
+
+    `dependencies` maps each module name to its direct intra-bundle
+    dependencies. Returns a tuple of (install_order, closure, dependents,
+    cycles): a global install order with dependencies before their
+    dependents, the transitive dependencies of each module, the modules
+    directly depending on each module, and any dependency cycles found.
+    """
+    # Tarjan's strongly connected components algorithm. Components are
+    # completed dependencies-first, which is exactly the install order.
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    install_order = []
+    cycles = []
+    closure = {}
+
+    def visit(module):
+        index[module] = lowlink[module] = len(index)
+        stack.append(module)
+        on_stack.add(module)
+        for dependency in dependencies.get(module, ()):
+            if dependency not in index:
+                visit(dependency)
+                lowlink[module] = min(lowlink[module], lowlink[dependency])
+            elif dependency in on_stack:
+                lowlink[module] = min(lowlink[module], index[dependency])
+
+        if lowlink[module] != index[module]:
+            return
+
+        component = []
+        while True:
+            member = stack.pop()
+            on_stack.discard(member)
+            component.append(member)
+            if member == module:
+                break
+        component.sort()
+        if len(component) > 1 or module in dependencies.get(module, ()):
+            cycles.append(component)
+
+        # Every component this one depends on is already resolved
+        reachable = set()
+        for member in component:
+            for dependency in dependencies.get(member, ()):
+                reachable.add(dependency)
+                reachable.update(closure.get(dependency, ()))
+        for member in component:
+            closure[member] = reachable - {member}
+        install_order.extend(component)
+
+    for module in sorted(dependencies):
+        if module not in index:
+            visit(module)
+
+    position = {module: i for i, module in enumerate(install_order)}
+    ordered_closure = {
+        module: sorted(reachable, key=position.__getitem__) for module, reachable in closure.items()
+    }
+
+    dependents = {module: set() for module in dependencies}
+    for module, direct in dependencies.items():
+        for dependency in direct:
+            dependents.setdefault(dependency, set()).add(module)
+
+    return (
+        install_order,
+        ordered_closure,
+        {module: sorted(users) for module, users in dependents.items()},
+        cycles,
+    )
+
+
 def build_bundle_json(
     libs, bundle_version, output_filename, package_folder_prefix, remote_name="origin"
 ):
@@ -140,10 +237,203 @@ def build_bundle_json(
         library["pypi_description"] = package["pypi_description"]
         library_submodules[package["module_name"]] = library
 
+    install_order, closure, dependents, cycles = resolve_bundle_dependencies(
+        {name: library["dependencies"] for name, library in library_submodules.items()}
+    )
+    for cycle in cycles:
+        logger.warning("dependency cycle between " + ", ".join(cycle))
+    for name, library in library_submodules.items():
+        library["transitive_dependencies"] = closure[name]
+        library["dependents"] = dependents[name]
+
     out_file = open(output_filename, "w")
     json.dump(library_submodules, out_file, sort_keys=True)
     out_file.close()
 
+    # The bundle JSON stays keyed by module only, so the bundle-wide results
+    # go in a companion file. Single library builds have no use for it.
+    if len(libs) > 1:
+        with open(os.path.splitext(output_filename)[0] + ".deps.json", "w") as deps_file:
+            json.dump({"install_order": install_order, "cycles": cycles}, deps_file)
+
+
+BUNDLE_INDEX_NAME = "bundle_index.json"
+
+
+def _index_group(relative_name, example_modules=None):
+    """
+    Return the module an archive member belongs to, or "" for bundle-level
+    files such as VERSIONS.txt
+
+    Examples are staged under the directory name of their library, which
+    `example_modules` maps to the module name.
+    """
+    parts = relative_name.split("/")
+    if parts[0] in {"lib", "requirements"} and len(parts) > 1:
+        if len(parts) == 2:
+            return os.path.splitext(parts[1])[0]
+        return parts[1]
+    if parts[0] == "examples" and len(parts) > 2:
+        return (example_modules or {}).get(parts[1]) or parts[1]
+    return ""
+
+
+def write_bundle_index(bundle, top_folder, hashes, sidecar_filename, example_modules=None):
+    """
+    Record where each module's members live in the zip, so that clients can
+    fetch them with HTTP range requests or compare hashes without
+    decompressing. The index is added as the last member of the zip and also
+    written next to it.
+    """
+    modules = {}
+    for info in bundle.infolist():
+        relative_name = info.filename[len(top_folder + "/") :]
+        modules.setdefault(_index_group(relative_name, example_modules), []).append(
+            {
+                "name": info.filename,
+                "offset": info.header_offset,
+                "compress_size": info.compress_size,
+                "compress_type": info.compress_type,
+                "file_size": info.file_size,
+                "sha256": hashes[info.filename],
+            }
+        )
+    index = json.dumps({"top_folder": top_folder, "modules": modules}, separators=(",", ":"))
+    bundle.writestr(f"{top_folder}/{BUNDLE_INDEX_NAME}", index)
+    with open(sidecar_filename, "w") as f:
+        f.write(index)
+
+
+def _pass_kind(mpy_cross, example_bundle):
+    if example_bundle:
+        return "examples"
+    return "mpy" if mpy_cross else "py"
+
+
+def _timing_keys(libs, library_location=None):
+    """
+    Name each library by its path from the directory holding library_location,
+    which unlike its directory name is unique across category folders
+    """
+    if library_location is None:
+        library_location = os.path.commonpath(libs)
+    parent = os.path.dirname(os.path.abspath(library_location))
+    return {path: os.path.relpath(path, parent) for path in libs}
+
+
+def _by_expected_cost(libs, timings, keys):
+    """
+    Order libraries so that the slowest ones from earlier runs start first.
+    New libraries may well be large, so they start along with the slowest.
+    """
+    unknown = max(timings.values(), default=0.0)
+    return sorted(libs, key=lambda path: timings.get(keys[path], unknown), reverse=True)
+
+
+def _build_library(library_path, build_lib_dir, package_folder_prefix, **kwargs):
+    """
+    Build one library, returning the time it took, its module name, any error
+    message and, in a worker process, the log records to write
+    """
+    start = time.monotonic()
+    try:
+        module_name = build.library(library_path, build_lib_dir, package_folder_prefix, **kwargs)
+    except ValueError as e:
+        return time.monotonic() - start, None, str(e), log.collected_records()
+    return time.monotonic() - start, module_name, None, log.collected_records()
+
+
+def _build_libraries(
+    libs,
+    library_location,
+    output_filename,
+    build_lib_dir,
+    package_folder_prefix,
+    executor,
+    **kwargs,
+):
+    """
+    Build every library into the staging tree, returning whether all
+    succeeded and the module name of each library directory
+    """
+    kind = _pass_kind(kwargs["mpy_cross"], kwargs["example_bundle"])
+    keys = _timing_keys(libs, library_location)
+    top_folder = os.path.basename(output_filename).replace(".zip", "")
+    build_one = functools.partial(
+        _build_library,
+        build_lib_dir=build_lib_dir,
+        package_folder_prefix=package_folder_prefix,
+        **kwargs,
+    )
+    # Start the slowest libraries first so that they don't stretch the end of
+    # a parallel build
+    recorded = cache.load_timings(build.mpy_cross_path).get(kind, {})
+    ordered_libs = _by_expected_cost(libs, recorded, keys)
+
+    success = True
+    timings = {}
+    module_names = {}
+    # Without an executor, libraries are built one at a time in this process
+    run = map if executor is None else executor.map
+    results = run(build_one, ordered_libs)
+    for done, (library_path, (elapsed, module_name, error, records)) in enumerate(
+        zip(ordered_libs, results), 1
+    ):
+        for record in records:
+            logger.handle(record)
+        timings[keys[library_path]] = round(elapsed, 3)
+        module_names[os.path.basename(library_path)] = module_name
+        log.event(
+            "library", bundle=output_filename, path=library_path, seconds=elapsed, error=error
+        )
+        log.progress(f"Building {top_folder}", done, len(ordered_libs))
+        if error is not None:
+            logger.error(f"build.library failure: {library_path}")
+            logger.error(error)
+            success = False
+    cache.save_timings(build.mpy_cross_path, kind, timings)
+    return success, module_names
+
+
+def plan_bundle(
+    libs,
+    output_filename,
+    package_folder_prefix,
+    mpy_cross=None,
+    example_bundle=False,
+    library_location=None,
+):
+    """
+    Print every action that build_bundle would take, with the cost of each
+    library estimated from earlier runs, without running any of them
+    """
+    build_dir = "build-" + os.path.basename(output_filename)
+    top_folder = os.path.basename(output_filename).replace(".zip", "")
+    build_lib_dir = os.path.join(build_dir, top_folder, "lib")
+    kind = _pass_kind(mpy_cross, example_bundle)
+    timings = cache.load_timings(build.mpy_cross_path).get(kind, {})
+    keys = _timing_keys(libs, library_location)
+
+    lines = []
+    for library_path in _by_expected_cost(libs, timings, keys):
+        try:
+            _, actions = build.library_actions(
+                library_path, build_lib_dir, package_folder_prefix, mpy_cross, example_bundle
+            )
+        except ValueError as e:
+            lines.append(f"  {library_path}: would fail: {e}")
+            continue
+        cost = timings.get(keys[library_path])
+        estimate = "unknown" if cost is None else f"{cost:.2f}s"
+        lines.append(f"  {library_path} (estimated {estimate})")
+        for action in actions:
+            lines.append(f"    {action.kind} {action.source} -> {action.destination}")
+    lines.append(f"  zip {build_dir} -> {output_filename}")
+
+    total = sum(timings.get(keys[path], 0.0) for path in libs)
+    print(f"Plan for {output_filename} ({kind} pass, estimated {total:.2f}s):")
+    print("\n".join(lines))
+
 
 def build_bundle(
     libs,
@@ -154,13 +444,18 @@ def build_bundle(
     mpy_cross=None,
     example_bundle=False,
     remote_name="origin",
+    compile_cache=None,
+    readme="README.txt",
+    executor=None,
+    verify_mpy=True,
+    library_location=None,
 ):
     build_dir = "build-" + os.path.basename(output_filename)
     top_folder = os.path.basename(output_filename).replace(".zip", "")
     build_lib_dir = os.path.join(build_dir, top_folder, "lib")
     build_example_dir = os.path.join(build_dir, top_folder, "examples")
     if os.path.isdir(build_dir):
-        print("Deleting existing build.")
+        logger.debug("Deleting existing build.")
         shutil.rmtree(build_dir)
     total_size = 0
     if not example_bundle:
@@ -171,23 +466,19 @@ def build_bundle(
 
     multiple_libs = len(libs) > 1
 
-    success = True
-    for library_path in libs:
-        try:
-            build.library(
-                library_path,
-                build_lib_dir,
-                package_folder_prefix,
-                mpy_cross=mpy_cross,
-                example_bundle=example_bundle,
-            )
-        except ValueError as e:
-            print("build.library failure:", library_path)
-            print(e)
-            success = False
+    success, example_modules = _build_libraries(
+        libs,
+        library_location,
+        output_filename,
+        build_lib_dir,
+        package_folder_prefix,
+        executor,
+        mpy_cross=mpy_cross,
+        example_bundle=example_bundle,
+        compile_cache=compile_cache,
+    )
 
-    print()
-    print("Generating VERSIONS")
+    logger.debug("Generating VERSIONS")
     if multiple_libs:
         with open(os.path.join(build_dir, top_folder, "VERSIONS.txt"), "w") as f:
             f.write(bundle_version + "\r\n")
@@ -200,7 +491,7 @@ def build_bundle(
                 check=False,  # Error handling done below
             )
             if versions.returncode != 0:
-                print(
+                logger.error(
                     "Failed to generate versions file. Its likely a library hasn't been "
                     "released yet."
                 )
@@ -225,17 +516,20 @@ def build_bundle(
                     )
 
     if not success:
-        print("WARNING: some failures above")
+        logger.error("Some libraries failed to build, see above")
         sys.exit(2)
 
-    print()
-    print("Zipping")
+    logger.debug("Zipping")
 
-    with zipfile.ZipFile(output_filename, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+    # Staged files may be hardlinks that keep the mtime of the source checkout
+    with zipfile.ZipFile(
+        output_filename, "w", compression=zipfile.ZIP_DEFLATED, strict_timestamps=False
+    ) as bundle:
         build_metadata = {"build-tools-version": build_tools_version}
         bundle.comment = json.dumps(build_metadata).encode("utf-8")
+        hashes = {}
         if multiple_libs:
-            total_size += add_file(bundle, "README.txt", os.path.join(top_folder, "README.txt"))
+            total_size += add_file(bundle, readme, os.path.join(top_folder, "README.txt"), hashes)
         for root, dirs, files in os.walk(build_dir):
             ziproot = root[len(build_dir + "/") :]
             for filename in files:
@@ -243,11 +537,176 @@ def build_bundle(
                     bundle,
                     os.path.join(root, filename),
                     os.path.join(ziproot, filename.replace("-", "_")),
+                    hashes,
                 )
+        # Single library zips are fetched whole, so only bundles get an index
+        if multiple_libs:
+            write_bundle_index(
+                bundle,
+                top_folder,
+                hashes,
+                output_filename.replace(".zip", ".index.json"),
+                example_modules,
+            )
+
+    file_count = len(hashes)
+    logger.info(
+        f"Bundled {file_count} files, {total_size} B ({total_size / 1024:.1f} kiB) "
+        f"in {output_filename}"
+    )
+    log.event(
+        "bundle",
+        path=output_filename,
+        files=file_count,
+        size=os.path.getsize(output_filename),
+        sector_size=total_size,
+    )
+
+    if mpy_cross and verify_mpy:
+        problems = verify.verify_bundle(output_filename, mpy_cross)
+        for problem in problems:
+            logger.error(problem)
+        if problems:
+            # Keep a later upload step from picking up the mismatched bundle
+            for bad_filename in (output_filename, output_filename.replace(".zip", ".index.json")):
+                if os.path.exists(bad_filename):
+                    os.remove(bad_filename)
+            logger.error(f"{output_filename} does not match {mpy_cross} and was removed")
+            sys.exit(2)
+
 
-    print()
-    print(total_size, "B", total_size / 1024, "kiB", total_size / 1024 / 1024, "MiB")
-    print("Bundled in", output_filename)
+DELTA_MANIFEST_NAME = "delta_manifest.json"
+
+
+def _bundle_members(bundle, top_folder):
+    """
+    Return the module and sha256 of every file in a bundle zip, keyed by its
+    path relative to the top folder
+    """
+    index_name = f"{top_folder}/{BUNDLE_INDEX_NAME}"
+    if index_name in bundle.namelist():
+        index = json.loads(bundle.read(index_name))
+        members = {
+            entry["name"]: (group, entry["sha256"])
+            for group, entries in index["modules"].items()
+            for entry in entries
+        }
+    else:
+        # Without an index, examples can only be grouped by their directory name
+        members = {
+            info.filename: (
+                _index_group(info.filename[len(top_folder + "/") :]),
+                hashlib.sha256(bundle.read(info)).hexdigest(),
+            )
+            for info in bundle.infolist()
+            if not info.is_dir()
+        }
+    return {
+        name[len(top_folder + "/") :]: member
+        for name, member in members.items()
+        if name.startswith(top_folder + "/") and name != index_name
+    }
+
+
+def _bundle_versions(json_filename):
+    if json_filename is None or not os.path.exists(json_filename):
+        return {}
+    with open(json_filename) as f:
+        return {name: library["version"] for name, library in json.load(f).items()}
+
+
+def _member_groups(members, modules):
+    """
+    Group file names by module. Files of groups that are not bundle JSON
+    modules are compared one by one along with the bundle-level files.
+    """
+    groups = {}
+    for name, (group, _) in members.items():
+        key = group if not modules or group in modules else ""
+        groups.setdefault(key, set()).add(name)
+    return groups
+
+
+def _delta_manifest(previous_members, current_members, previous_versions, current_versions):
+    """
+    Compare the files of two bundles, returning the changed and removed
+    modules and files
+    """
+    modules = set(previous_versions) | set(current_versions)
+    previous_groups = _member_groups(previous_members, modules)
+    current_groups = _member_groups(current_members, modules)
+    previous_hashes = {name: digest for name, (_, digest) in previous_members.items()}
+    current_hashes = {name: digest for name, (_, digest) in current_members.items()}
+
+    changed_modules = []
+    updated_files = []
+    for group, names in sorted(current_groups.items()):
+        if not group:
+            # Bundle-level files are compared one by one
+            updated_files.extend(
+                name for name in sorted(names) if previous_hashes.get(name) != current_hashes[name]
+            )
+            continue
+        unchanged = (
+            names == previous_groups.get(group)
+            and all(previous_hashes[name] == current_hashes[name] for name in names)
+            and previous_versions.get(group) == current_versions.get(group)
+        )
+        if not unchanged:
+            changed_modules.append(group)
+            updated_files.extend(sorted(names))
+
+    return {
+        "changed_modules": changed_modules,
+        "removed_modules": sorted(set(previous_groups) - set(current_groups) - {""}),
+        "updated_files": updated_files,
+        "removed_files": sorted(set(previous_hashes) - set(current_hashes)),
+    }
+
+
+def build_delta_bundle(
+    previous_filename,
+    current_filename,
+    output_filename,
+    previous_json=None,
+    current_json=None,
+):
+    """
+    Generate a zip holding only the libraries that changed since a previous
+    release, along with a manifest for patching an extracted copy of the
+    previous bundle in place
+    """
+    previous_top = os.path.basename(previous_filename).replace(".zip", "")
+    current_top = os.path.basename(current_filename).replace(".zip", "")
+
+    with zipfile.ZipFile(previous_filename) as previous:
+        previous_members = _bundle_members(previous, previous_top)
+
+    with zipfile.ZipFile(current_filename) as current:
+        manifest = {
+            "previous_top_folder": previous_top,
+            "top_folder": current_top,
+            **_delta_manifest(
+                previous_members,
+                _bundle_members(current, current_top),
+                _bundle_versions(previous_json),
+                _bundle_versions(current_json),
+            ),
+        }
+
+        with zipfile.ZipFile(output_filename, "w", compression=zipfile.ZIP_DEFLATED) as delta:
+            delta.comment = current.comment
+            delta.writestr(DELTA_MANIFEST_NAME, json.dumps(manifest, indent=1))
+            for name in manifest["updated_files"]:
+                info = current.getinfo(f"{current_top}/{name}")
+                delta_info = zipfile.ZipInfo(info.filename, info.date_time)
+                delta_info.external_attr = info.external_attr
+                delta.writestr(delta_info, current.read(info), compress_type=zipfile.ZIP_DEFLATED)
+
+    logger.info(
+        f"Delta from {previous_top}: {len(manifest['changed_modules'])} changed, "
+        f"{len(manifest['removed_modules'])} removed libraries in {output_filename}"
+    )
 
 
 def _find_libraries(current_path, depth):
@@ -264,10 +723,191 @@ def _find_libraries(current_path, depth):
 all_modules = ["py", "mpy", "example", "json"]
 
 
+def build_bundle_set(
+    filename_prefix,
+    output_directory,
+    library_location,
+    library_depth,
+    package_folder_prefix,
+    remote_name,
+    ignore,
+    bundle_version,
+    build_tools_version,
+    mpy_crosses,
+    compile_cache=None,
+    delta_from=None,
+    readme="README.txt",
+    executor=None,
+    plan=False,
+    verify_mpy=True,
+):
+    """
+    Build the py, mpy, example and JSON outputs of one bundle
+
+    `mpy_crosses` maps each target version name to its mpy-cross, so that
+    several bundles built in one run resolve them only once. Likewise a
+    process pool `executor` builds the libraries of every pass in parallel.
+    With `plan`, the actions of every pass are printed instead of run.
+    """
+    package_folder_prefix = package_folder_prefix.split(", ")
+
+    libs = _find_libraries(os.path.abspath(library_location), library_depth)
+
+    if not plan:
+        os.makedirs(output_directory, exist_ok=True)
+        build_tools_fn = f"z-build_tools_version-{build_tools_version}.ignore"
+        build_tools_fn = os.path.join(output_directory, build_tools_fn)
+        with open(build_tools_fn, "w") as f:
+            f.write(build_tools_version)
+
+    previous_version = None
+    if delta_from:
+        previous_json = os.path.basename(delta_from)
+        if not (
+            previous_json.startswith(filename_prefix + "-")
+            and previous_json.endswith(".json")
+            and not previous_json.endswith(".deps.json")
+        ):
+            raise SystemExit(f"--delta_from must be a {filename_prefix}-<version>.json file")
+        try:
+            _bundle_versions(delta_from)
+        except (ValueError, KeyError, TypeError):
+            raise SystemExit(f"--delta_from {delta_from} is not a bundle JSON") from None
+        previous_version = previous_json[len(filename_prefix + "-") : -len(".json")]
+
+    def bundle_pass(zip_filename, mpy_cross=None, example_bundle=False):
+        if plan:
+            plan_bundle(
+                libs,
+                zip_filename,
+                package_folder_prefix,
+                mpy_cross,
+                example_bundle,
+                library_location=library_location,
+            )
+            return
+        build_bundle(
+            libs,
+            bundle_version,
+            zip_filename,
+            package_folder_prefix,
+            build_tools_version=build_tools_version,
+            mpy_cross=mpy_cross,
+            example_bundle=example_bundle,
+            remote_name=remote_name,
+            compile_cache=compile_cache,
+            readme=readme,
+            executor=executor,
+            verify_mpy=verify_mpy,
+            library_location=library_location,
+        )
+
+    # Zip files built, keyed by the kind of bundle in their name
+    built_zips = {}
+
+    # Build raw source .py bundle
+    if "py" not in ignore:
+        zip_filename = os.path.join(output_directory, f"{filename_prefix}-py-{bundle_version}.zip")
+        built_zips["py"] = zip_filename
+        bundle_pass(zip_filename)
+
+    # Build .mpy bundle(s)
+    if "mpy" not in ignore:
+        for version in target_versions.VERSIONS:
+            zip_filename = os.path.join(
+                output_directory,
+                f"{filename_prefix}-{version['name']}-mpy-{bundle_version}.zip",
+            )
+            built_zips[f"{version['name']}-mpy"] = zip_filename
+            bundle_pass(zip_filename, mpy_cross=mpy_crosses[version["name"]])
+
+    # Build example bundle
+    if "example" not in ignore:
+        zip_filename = os.path.join(
+            output_directory,
+            f"{filename_prefix}-examples-{bundle_version}.zip",
+        )
+        built_zips["examples"] = zip_filename
+        bundle_pass(zip_filename, example_bundle=True)
+
+    # Build Bundle JSON
+    json_filename = os.path.join(output_directory, f"{filename_prefix}-{bundle_version}.json")
+    if plan:
+        if "json" not in ignore:
+            print(f"Plan for {json_filename}: describe {len(libs)} libraries")
+        return
+    if "json" not in ignore:
+        build_bundle_json(
+            libs, bundle_version, json_filename, package_folder_prefix, remote_name=remote_name
+        )
+
+    # Build delta bundles against the previous release
+    if previous_version is not None:
+        previous_directory = os.path.dirname(delta_from)
+        for kind, zip_filename in built_zips.items():
+            previous_filename = os.path.join(
+                previous_directory, f"{filename_prefix}-{kind}-{previous_version}.zip"
+            )
+            if not os.path.exists(previous_filename):
+                logger.warning(
+                    f"No previous {kind} bundle at {previous_filename}, skipping its delta"
+                )
+                continue
+            build_delta_bundle(
+                previous_filename,
+                zip_filename,
+                os.path.join(
+                    output_directory,
+                    f"{filename_prefix}-{kind}-delta-{previous_version}-{bundle_version}.zip",
+                ),
+                previous_json=delta_from,
+                current_json=json_filename,
+            )
+
+
+def load_bundle_config(
+    config_filename, output_directory, library_depth, package_folder_prefix, remote_name
+):
+    """
+    Read the bundle definitions of a TOML config file. Each `[[bundles]]`
+    table takes the same settings as the command line options.
+
+    Relative paths set in a table are resolved against the directory of the
+    config file. Settings left to their defaults, such as the `output_directory`
+    of the command line, stay relative to the working directory.
+    """
+    with open(config_filename, encoding="utf-8") as f:
+        config = build.load_toml(f.read())
+    config_directory = os.path.dirname(os.path.abspath(config_filename))
+
+    bundles = []
+    for definition in config.get("bundles", []):
+        missing = {"filename_prefix", "library_location"} - set(definition)
+        if missing:
+            raise SystemExit(f"{config_filename}: bundle is missing {', '.join(sorted(missing))}")
+        bundle = {
+            "filename_prefix": definition["filename_prefix"],
+            "output_directory": definition.get("output_directory", output_directory),
+            "library_location": definition["library_location"],
+            "library_depth": definition.get("library_depth", library_depth),
+            "package_folder_prefix": definition.get("package_folder_prefix", package_folder_prefix),
+            "remote_name": definition.get("remote_name", remote_name),
+            "readme": definition.get("readme", "README.txt"),
+            "delta_from": definition.get("delta_from"),
+        }
+        for key in ("output_directory", "library_location", "readme", "delta_from"):
+            if key in definition:
+                bundle[key] = os.path.join(config_directory, bundle[key])
+        bundles.append(bundle)
+    if not bundles:
+        raise SystemExit(f"{config_filename}: no [[bundles]] defined")
+    return bundles
+
+
 @click.command()
-@click.option("--filename_prefix", required=True, help="Filename prefix for the output zip files.")
+@click.option("--filename_prefix", help="Filename prefix for the output zip files.")
 @click.option("--output_directory", default="bundles", help="Output location for the zip files.")
-@click.option("--library_location", required=True, help="Location of libraries to bundle.")
+@click.option("--library_location", help="Location of libraries to bundle.")
 @click.option(
     "--library_depth",
     default=0,
@@ -290,6 +930,43 @@ all_modules = ["py", "mpy", "example", "json"]
 @click.option(
     "--only", "-o", multiple=True, type=click.Choice(all_modules), help="Bundles to build building"
 )
+@click.option(
+    "--delta_from",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Bundle JSON of a previous release. Its zips are expected in the same directory, and a "
+    "delta zip against each of them is built.",
+)
+@click.option(
+    "--config",
+    type=click.Path(exists=True, dir_okay=False),
+    help="TOML file defining several bundles to build in one run, in place of --filename_prefix "
+    "and --library_location.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    help="Number of libraries to build in parallel. The slowest libraries of earlier runs are "
+    "started first.",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="List the actions of every bundle pass, with estimated costs, without running them.",
+)
+@click.option("--quiet", "-q", is_flag=True, help="Only show warnings and errors.")
+@click.option("--verbose", "-v", is_flag=True, help="Show every file added to the bundles.")
+@click.option("--log_file", help="Write detailed output, including every bundled file, here.")
+@click.option(
+    "--events_file",
+    help="Write a JSON-lines stream of build events, including every bundled file and its size.",
+)
+@click.option(
+    "--verify/--no-verify",
+    "verify_mpy",
+    default=True,
+    help="Check that every .mpy in the mpy bundles matches the bytecode of its target version.",
+)
 def build_bundles(
     filename_prefix,
     output_directory,
@@ -299,79 +976,85 @@ def build_bundles(
     remote_name,
     ignore,
     only,
+    delta_from,
+    config,
+    jobs,
+    plan,
+    verify_mpy,
+    quiet,
+    verbose,
+    log_file,
+    events_file,
 ):
-    os.makedirs(output_directory, exist_ok=True)
-
-    package_folder_prefix = package_folder_prefix.split(", ")
-
-    bundle_version = build.version_string()
-
-    libs = _find_libraries(os.path.abspath(library_location), library_depth)
-
-    try:
-        build_tools_version: str = importlib_metadata.version("circuitpython-build-tools")
-    except importlib_metadata.PackageNotFoundError:
-        build_tools_version = "devel"
+    log.setup(quiet=quiet, verbose=verbose, log_file=log_file, events_file=events_file)
 
-    build_tools_fn = f"z-build_tools_version-{build_tools_version}.ignore"
-    build_tools_fn = os.path.join(output_directory, build_tools_fn)
-    with open(build_tools_fn, "w") as f:
-        f.write(build_tools_version)
+    if config:
+        if filename_prefix or library_location or delta_from:
+            raise SystemExit(
+                "--filename_prefix, --library_location and --delta_from go in the --config file"
+            )
+        bundles = load_bundle_config(
+            config, output_directory, library_depth, package_folder_prefix, remote_name
+        )
+    elif not (filename_prefix and library_location):
+        raise SystemExit("Specify --filename_prefix and --library_location, or --config")
+    else:
+        bundles = [
+            {
+                "filename_prefix": filename_prefix,
+                "output_directory": output_directory,
+                "library_location": library_location,
+                "library_depth": library_depth,
+                "package_folder_prefix": package_folder_prefix,
+                "remote_name": remote_name,
+                "delta_from": delta_from,
+            }
+        ]
 
     if ignore and only:
         raise SystemExit("Only specify one of --ignore / --only")
     if only:
         ignore = set(all_modules) - set(only)
 
-    # Build raw source .py bundle
-    if "py" not in ignore:
-        zip_filename = os.path.join(output_directory, f"{filename_prefix}-py-{bundle_version}.zip")
-        build_bundle(
-            libs,
-            bundle_version,
-            zip_filename,
-            package_folder_prefix,
-            build_tools_version=build_tools_version,
-            remote_name=remote_name,
-        )
+    try:
+        build_tools_version: str = importlib_metadata.version("circuitpython-build-tools")
+    except importlib_metadata.PackageNotFoundError:
+        build_tools_version = "devel"
 
-    # Build .mpy bundle(s)
+    mpy_crosses = {}
     if "mpy" not in ignore:
         for version in target_versions.VERSIONS:
-            mpy_cross = build.mpy_cross(version)
-            zip_filename = os.path.join(
-                output_directory,
-                f"{filename_prefix}-{version['name']}-mpy-{bundle_version}.zip",
-            )
-            build_bundle(
-                libs,
-                bundle_version,
-                zip_filename,
-                package_folder_prefix,
-                mpy_cross=mpy_cross,
-                build_tools_version=build_tools_version,
-                remote_name=remote_name,
-            )
-
-    # Build example bundle
-    if "example" not in ignore:
-        zip_filename = os.path.join(
-            output_directory,
-            f"{filename_prefix}-examples-{bundle_version}.zip",
-        )
-        build_bundle(
-            libs,
-            bundle_version,
-            zip_filename,
-            package_folder_prefix,
-            build_tools_version=build_tools_version,
-            example_bundle=True,
-            remote_name=remote_name,
-        )
+            if plan:
+                mpy_crosses[version["name"]] = build.mpy_cross_filename_for(version)
+            else:
+                mpy_crosses[version["name"]] = build.mpy_cross(version)
 
-    # Build Bundle JSON
-    if "json" not in ignore:
-        json_filename = os.path.join(output_directory, f"{filename_prefix}-{bundle_version}.json")
-        build_bundle_json(
-            libs, bundle_version, json_filename, package_folder_prefix, remote_name=remote_name
+    # Compiled modules and worker processes are shared between bundles, so a
+    # library checked out in more than one of them is only compiled once per
+    # target version and workers are only started once
+    if jobs > 1 and not plan:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=log.setup_worker
         )
+    else:
+        pool = contextlib.nullcontext()
+    with (
+        tempfile.TemporaryDirectory(prefix="circuitpython-build-") as compile_cache,
+        pool as executor,
+    ):
+        for bundle in bundles:
+            if config:
+                bundle_version = build.version_string(bundle["library_location"])
+            else:
+                bundle_version = build.version_string()
+            build_bundle_set(
+                ignore=ignore,
+                bundle_version=bundle_version,
+                build_tools_version=build_tools_version,
+                mpy_crosses=mpy_crosses,
+                compile_cache=compile_cache,
+                executor=executor,
+                plan=plan,
+                verify_mpy=verify_mpy,
+                **bundle,
+            )
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+import datetime
+import re
+
+import click
+
+from circuitpython_build_tools import build, cache, target_versions
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(size):
+    """Parse a size such as 500M or 10G into bytes"""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?", size.strip(), re.IGNORECASE)
+    if match is None:
+        raise click.BadParameter(f"{size!r} is not a size like 500M or 10G")
+    return int(float(match[1]) * SIZE_UNITS[match[2].upper()])
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    return f"{size:.1f} {unit}"
+
+
+def _print_removed(removed):
+    for entry in removed:
+        print(f"Removed {entry.name} ({format_size(entry.size)})")
+    print(f"Freed {format_size(sum(entry.size for entry in removed))}")
+
+
+@click.group()
+def main():
+    """Manage the cached mpy-cross binaries and CircuitPython clones"""
+
+
+@main.command("list")
+def list_entries():
+    entries = cache.entries(build.mpy_cross_path)
+    for entry in entries:
+        if entry.last_used:
+            last_used = datetime.datetime.fromtimestamp(entry.last_used).isoformat(" ", "seconds")
+        else:
+            last_used = "never"
+        stale = " (not in target versions)" * cache.is_stale(entry, target_versions.VERSIONS)
+        print(f"{format_size(entry.size):>12}  {last_used:19}  {entry.name}{stale}")
+    total = sum(entry.size for entry in entries)
+    print(f"{format_size(total):>12}  total in {build.mpy_cross_path}")
+
+
+@main.command()
+@click.option("--max-size", required=True, help="Size to shrink the cache to, such as 10G.")
+def evict(max_size):
+    _print_removed(cache.evict(build.mpy_cross_path, parse_size(max_size)))
+
+
+@main.command()
+def prune():
+    _print_removed(cache.prune(build.mpy_cross_path, target_versions.VERSIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,13 @@
 
 import click
 
-from circuitpython_build_tools import build, target_versions
+from circuitpython_build_tools import build, log, target_versions
 
 
 @click.command
 @click.argument("versions")
 def main(versions):
+    log.setup()
     print(versions)
     for version in [v for v in target_versions.VERSIONS if v["name"] in versions]:
         print(f"{version['name']}: {build.mpy_cross(version)}")
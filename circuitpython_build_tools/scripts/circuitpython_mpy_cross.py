@@ -5,6 +5,7 @@ import subprocess
 
 import click
 
+from .. import log
 from ..build import mpy_cross
 from ..target_versions import VERSIONS
 
@@ -16,6 +17,7 @@ from ..target_versions import VERSIONS
 @click.option("--quiet/--no-quiet", "quiet", type=bool, default=True)
 @click.argument("mpy-cross-args", nargs=-1, required=True)
 def main(circuitpython_version, quiet, mpy_cross_args):
+    log.setup(quiet=quiet)
     (version_info,) = [v for v in VERSIONS if v["name"] == circuitpython_version]
     mpy_cross_exe = str(mpy_cross(version_info, quiet))
     try:
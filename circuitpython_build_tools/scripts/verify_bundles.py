@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+import click
+
+from circuitpython_build_tools import build, target_versions, verify
+
+
+@click.command()
+@click.option(
+    "--circuitpython-version",
+    required=True,
+    type=click.Choice([version["name"] for version in target_versions.VERSIONS]),
+)
+@click.option("--jobs", "-j", type=int, help="Number of worker threads.")
+@click.argument("bundles", nargs=-1, required=True, type=click.Path(exists=True))
+def main(circuitpython_version, jobs, bundles):
+    """Check the .mpy files of bundle zips or staging trees against their target version"""
+    (version_info,) = [v for v in target_versions.VERSIONS if v["name"] == circuitpython_version]
+    mpy_cross = build.mpy_cross(version_info, quiet=True)
+    failed = False
+    for bundle in bundles:
+        problems = verify.verify_bundle(bundle, mpy_cross, jobs=jobs)
+        for problem in problems:
+            print(problem)
+        print(f"{bundle}: {'FAILED' if problems else 'OK'}")
+        failed = failed or bool(problems)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2017 Scott Shawcroft, written for Adafruit Industries
+#
+# SPDX-License-Identifier: MIT
+
+import concurrent.futures
+import functools
+import os
+import os.path
+import subprocess
+import tempfile
+import zipfile
+
+# magic, bytecode version, feature flags and small int bits
+MPY_HEADER_FIELDS = ("magic", "version", "feature flags", "small int bits")
+MPY_HEADER_SIZE = len(MPY_HEADER_FIELDS)
+
+# Members checked by each worker. Larger batches amortize opening the zip.
+BATCH_SIZE = 64
+
+
+@functools.cache
+def expected_header(mpy_cross):
+    """Return the .mpy header that mpy_cross produces"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        source = os.path.join(temp_dir, "probe.py")
+        output = os.path.join(temp_dir, "probe.mpy")
+        with open(source, "w") as f:
+            f.write("x = 1\n")
+        subprocess.check_call([mpy_cross, "-o", output, "-s", "probe.py", source])
+        with open(output, "rb") as f:
+            return f.read(MPY_HEADER_SIZE)
+
+
+def _header_problem(name, header, expected):
+    if len(header) < MPY_HEADER_SIZE:
+        return f"{name}: truncated .mpy header"
+    for field, found, wanted in zip(MPY_HEADER_FIELDS, header, expected):
+        if found != wanted:
+            return f"{name}: {field} is {found:#04x}, expected {wanted:#04x}"
+    return None
+
+
+def _check_zip_members(zip_filename, names, expected):
+    with zipfile.ZipFile(zip_filename) as bundle:
+        problems = []
+        for name in names:
+            with bundle.open(name) as member:
+                problems.append(_header_problem(name, member.read(MPY_HEADER_SIZE), expected))
+    return problems
+
+
+def _check_files(root, names, expected):
+    problems = []
+    for name in names:
+        with open(os.path.join(root, name), "rb") as f:
+            problems.append(_header_problem(name, f.read(MPY_HEADER_SIZE), expected))
+    return problems
+
+
+def _list_files(path):
+    """
+    Return (name, size) of every file in a zip or staging tree, named by its
+    "/" separated path from the root of the tree
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as bundle:
+            return [(info.filename, info.file_size) for info in bundle.infolist()]
+    files = []
+    for root, dirs, filenames in os.walk(path):
+        for filename in filenames:
+            full_path = os.path.join(root, filename)
+            name = os.path.relpath(full_path, path).replace(os.sep, "/")
+            files.append((name, os.path.getsize(full_path)))
+    return files
+
+
+def verify_bundle(path, mpy_cross, jobs=None):
+    """
+    Check every .mpy in a bundle zip or staging tree (the build-<zip name>
+    directory holding the top folder) against the header that mpy_cross
+    produces, and that no compiled library still ships a .py. Returns a
+    list of problems, empty if the bundle is consistent.
+    """
+    expected = expected_header(mpy_cross)
+    files = _list_files(path)
+    names = {name for name, _ in files}
+
+    problems = []
+    for name, size in files:
+        parts = name.split("/")
+        # Empty files are bundled as .py since there is nothing to compile
+        if len(parts) > 1 and parts[1] == "lib" and name.endswith(".py") and size > 0:
+            if name[: -len(".py")] + ".mpy" not in names:
+                problems.append(f"{name}: no .mpy counterpart")
+
+    mpy_names = sorted(name for name in names if name.endswith(".mpy"))
+    batches = [mpy_names[i : i + BATCH_SIZE] for i in range(0, len(mpy_names), BATCH_SIZE)]
+    if zipfile.is_zipfile(path):
+        check = functools.partial(_check_zip_members, path, expected=expected)
+    else:
+        check = functools.partial(_check_files, path, expected=expected)
+    # Reading a header is mostly zlib and file I/O, both of which release the GIL
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for batch_problems in executor.map(check, batches):
+            problems.extend(problem for problem in batch_problems if problem is not None)
+    return problems